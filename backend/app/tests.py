@@ -1,3 +1,224 @@
-from django.test import TestCase
+import hashlib
+import os
+import time
+from unittest import mock
 
-# Create your tests here.
+import orjson
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+
+from . import utils
+from .utils import build_batch_jsonl, build_prompt, parse_batch_output, _sse_delta
+
+
+def _output_row(custom_id, content, status_code=200):
+    return orjson.dumps({
+        "custom_id": custom_id,
+        "response": {
+            "status_code": status_code,
+            "body": {"choices": [{"message": {"content": content}}]},
+        },
+    })
+
+
+class BatchJsonlTests(SimpleTestCase):
+    def test_one_request_per_item_keyed_by_name(self):
+        raw = build_batch_jsonl(["Veg Burger", "Paneer Tikka"], "gpt-4o-mini")
+        self.assertTrue(raw.endswith(b"\n"))
+        rows = [orjson.loads(line) for line in raw.splitlines()]
+        self.assertEqual([row["custom_id"] for row in rows], ["Veg Burger", "Paneer Tikka"])
+        for row in rows:
+            self.assertEqual(row["method"], "POST")
+            self.assertEqual(row["url"], "/v1/chat/completions")
+            self.assertEqual(row["body"]["model"], "gpt-4o-mini")
+
+        system_prompt, user_prompt = build_prompt("Veg Burger")
+        self.assertEqual(
+            [m["content"] for m in rows[0]["body"]["messages"]], [system_prompt, user_prompt]
+        )
+
+
+class BatchOutputTests(SimpleTestCase):
+    def test_results_mapped_by_custom_id(self):
+        raw = b"\n".join([
+            _output_row("Veg Burger", '{"description": "Juicy patty", "upsell": "Crispy Fries"}'),
+            _output_row("Paneer Tikka", '{"description": "Smoky cubes", "upsell": "Pair it with Naan."}'),
+        ])
+        results = parse_batch_output(raw)
+        self.assertEqual(results["Veg Burger"], ("Juicy patty", "Pair it with Crispy Fries.", 2))
+        self.assertEqual(results["Paneer Tikka"], ("Smoky cubes", "Pair it with Naan.", 2))
+
+    def test_failed_rows_and_blank_lines_skipped(self):
+        raw = b"\n".join([
+            _output_row("Veg Burger", "{}", status_code=500),
+            b"",
+            _output_row("Paneer Tikka", '{"description": "Smoky cubes", "upsell": "Naan"}'),
+        ]) + b"\n"
+        self.assertEqual(list(parse_batch_output(raw)), ["Paneer Tikka"])
+
+    def test_malformed_rows_skipped(self):
+        raw = b"\n".join([
+            _output_row("Veg Burger", None),  # refusal / tool call
+            orjson.dumps({"custom_id": "Cheese Pizza", "response": {"status_code": 200, "body": {}}}),
+            b"not json",
+            _output_row("Paneer Tikka", '{"description": "Smoky cubes", "upsell": "Naan"}'),
+        ])
+        self.assertEqual(list(parse_batch_output(raw)), ["Paneer Tikka"])
+
+
+class SseDeltaTests(SimpleTestCase):
+    def test_content_delta(self):
+        line = b'data: {"choices": [{"delta": {"content": "{\\"desc"}}]}\n'
+        self.assertEqual(_sse_delta(line), '{"desc')
+
+    def test_lines_without_content(self):
+        self.assertIsNone(_sse_delta(b"data: [DONE]\n"))
+        self.assertIsNone(_sse_delta(b": keep-alive\n"))
+        self.assertIsNone(_sse_delta(b"\n"))
+        self.assertIsNone(_sse_delta(b'data: {"choices": [{"delta": {"role": "assistant"}}]}'))
+        self.assertIsNone(_sse_delta(b'data: {"choices": []}'))
+
+    def test_error_event_raises(self):
+        with self.assertRaises(RuntimeError):
+            _sse_delta(b'data: {"error": {"message": "overloaded"}}')
+
+
+class JsonBodyValidationTests(SimpleTestCase):
+    def test_non_object_body_is_rejected(self):
+        for url in ("/api/generate-item-details/", "/api/generate-item-details/batch/"):
+            with self.subTest(url=url):
+                response = self.client.post(url, data=b'["a"]', content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+
+
+class ItemDetailsHttpCacheTests(SimpleTestCase):
+    url = "/api/generate-item-details/"
+
+    def test_get_reads_query_params(self):
+        response = self.client.get(self.url, {"itemName": "  Veg Burger ", "model": "GPT-3.5"})
+        self.assertEqual(response.status_code, 200)
+        body = orjson.loads(response.content)
+        self.assertEqual(body["itemName"], "Veg Burger")
+        self.assertEqual(body["model"], "mock-gpt-3.5")
+        self.assertEqual(body["upsell"], "Pair it with a Crispy Fries!")
+
+    def test_get_revalidates_with_304(self):
+        response = self.client.get(self.url, {"itemName": "Veg Burger"})
+        etag = response["ETag"]
+        self.assertEqual(etag, '"%s"' % hashlib.sha1(response.content).hexdigest())
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+
+        response = self.client.get(self.url, {"itemName": "Veg Burger"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+    def test_stale_etag_gets_full_response(self):
+        response = self.client.get(self.url, {"itemName": "Veg Burger"}, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], '"stale"')
+
+    def test_fallback_has_no_cache_headers(self):
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": ""}):
+            response = self.client.get(self.url, {"itemName": "Veg Burger", "mode": "openai"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(orjson.loads(response.content)["model"], "mock-gpt-4")
+        self.assertFalse(response.has_header("ETag"))
+        self.assertFalse(response.has_header("Cache-Control"))
+
+    def test_post_has_no_cache_headers(self):
+        response = self.client.post(
+            self.url, data=orjson.dumps({"itemName": "Veg Burger"}), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("ETag"))
+
+
+class RedisBackoffTests(SimpleTestCase):
+    def test_failure_skips_redis_until_retry_time(self):
+        redis = mock.Mock()
+        redis.get = mock.AsyncMock(side_effect=OSError("connection refused"))
+        with mock.patch.object(utils, "REDIS_URL", "redis://cache:6379/0"), \
+                mock.patch.object(utils, "_redis_down_until", 0.0), \
+                mock.patch.object(utils, "_get_redis", return_value=redis):
+            self.assertIsNone(async_to_sync(utils._cache_get)(("missing",)))
+            self.assertIsNone(async_to_sync(utils._cache_get)(("missing",)))
+            self.assertEqual(redis.get.await_count, 1)
+            self.assertFalse(utils._redis_available())
+
+            with mock.patch.object(utils.time, "monotonic", return_value=time.monotonic() + 31):
+                self.assertTrue(utils._redis_available())
+
+
+class SanitizeItemNameTests(SimpleTestCase):
+    def test_strips_and_collapses_whitespace(self):
+        self.assertEqual(utils.sanitize_item_name("  Veg \t  Burger  "), "Veg Burger")
+        self.assertEqual(utils.sanitize_item_name("Dal\nMakhani"), "Dal Makhani")
+
+    def test_rejects_bad_input(self):
+        for name in (None, 42, "a", " a ", "x" * 121, "Burger<script>", "Naan;DROP"):
+            with self.subTest(name=name), self.assertRaises(ValueError):
+                utils.sanitize_item_name(name)
+
+    def test_allowed_punctuation(self):
+        self.assertEqual(utils.sanitize_item_name("Mac & Cheese (Large), 2/3"), "Mac & Cheese (Large), 2/3")
+
+
+class TruncateWordsTests(SimpleTestCase):
+    def test_short_text_kept_with_count(self):
+        self.assertEqual(utils.truncate_words("  Hot spicy bites "), ("Hot spicy bites", 3))
+        self.assertEqual(utils.truncate_words(""), ("", 0))
+
+    def test_long_text_cut_to_limit(self):
+        text = " ".join(f"w{i}" for i in range(40))
+        self.assertEqual(utils.truncate_words(text, 30), (" ".join(f"w{i}" for i in range(30)), 30))
+        self.assertEqual(utils.truncate_words("a  b\tc d", 3), ("a b c", 3))
+        self.assertEqual(utils.truncate_words("a b c", 3), ("a b c", 3))
+
+
+class LocalRateLimitTests(SimpleTestCase):
+    def setUp(self):
+        for shard in utils._SHARDS:
+            shard.buckets.clear()
+            shard.calls_since_sweep = 0
+        self.now = 1000.0
+        patcher = mock.patch.object(utils.time, "monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_denied(self):
+        for _ in range(utils.MAX_REQUESTS):
+            self.assertTrue(utils._check_rate_limit_local("10.0.0.1"))
+        self.assertFalse(utils._check_rate_limit_local("10.0.0.1"))
+        self.assertTrue(utils._check_rate_limit_local("10.0.0.2"))  # other IPs unaffected
+
+    def test_refill_over_time(self):
+        for _ in range(utils.MAX_REQUESTS):
+            utils._check_rate_limit_local("10.0.0.1")
+        seconds_per_token = utils.WINDOW_SEC / utils.MAX_REQUESTS
+        self.now += seconds_per_token / 2
+        self.assertFalse(utils._check_rate_limit_local("10.0.0.1"))  # half a token is not enough
+        self.now += seconds_per_token
+        self.assertTrue(utils._check_rate_limit_local("10.0.0.1"))
+        self.assertFalse(utils._check_rate_limit_local("10.0.0.1"))
+
+    def test_bucket_lives_on_its_shard(self):
+        ip = "10.0.0.7"
+        utils._check_rate_limit_local(ip)
+        index = hash(ip) & (utils._SHARD_COUNT - 1)
+        self.assertEqual(
+            [i for i, shard in enumerate(utils._SHARDS) if ip in shard.buckets], [index]
+        )
+
+    def test_idle_buckets_swept(self):
+        shard = utils._SHARDS[hash("10.0.0.1") & (utils._SHARD_COUNT - 1)]
+        utils._check_rate_limit_local("10.0.0.1")
+        self.now += utils.WINDOW_SEC
+        shard.calls_since_sweep = utils._SWEEP_EVERY // utils._SHARD_COUNT - 1
+        neighbour = next(
+            f"10.1.{i // 256}.{i % 256}" for i in range(10_000)
+            if utils._SHARDS[hash(f"10.1.{i // 256}.{i % 256}") & (utils._SHARD_COUNT - 1)] is shard
+        )
+        utils._check_rate_limit_local(neighbour)  # triggers the sweep on this shard
+        self.assertNotIn("10.0.0.1", shard.buckets)
+        self.assertIn(neighbour, shard.buckets)
@@ -1,6 +1,16 @@
 from django.urls import path
-from .views import generate_item_details
+from .views import (
+    generate_item_details,
+    generate_item_details_batch,
+    generate_item_details_batch_status,
+)
 
 urlpatterns = [
     path("generate-item-details/", generate_item_details, name="generate_item_details"),
+    path("generate-item-details/batch/", generate_item_details_batch, name="generate_item_details_batch"),
+    path(
+        "generate-item-details/batch/<str:batch_id>/",
+        generate_item_details_batch_status,
+        name="generate_item_details_batch_status",
+    ),
 ]
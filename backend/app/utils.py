@@ -1,16 +1,26 @@
 import os
 import re
 import time
-import json
-import random
+import asyncio
 import hashlib
-from collections import deque, defaultdict
+import threading
+import weakref
+from array import array
+from email.utils import parsedate_to_datetime
+from contextlib import asynccontextmanager
+from functools import lru_cache, wraps
 from typing import Tuple
 
-import requests
+import aiohttp
+import orjson
+from cachetools import TTLCache
+import redis.asyncio as aioredis
 
 # -------- Basic input validation & sanitization --------
-_ALLOWED_PATTERN = re.compile(r"^[A-Za-z0-9\s\-\&\'\(\)\,\.\+\/]+$")
+# whitespace is not listed: it is collapsed to a single " " before the check
+_ALLOWED_CHARS = frozenset(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 -&'(),.+/"
+)
 
 def sanitize_item_name(name: str) -> str:
     if not isinstance(name, str):
@@ -18,17 +28,25 @@ def sanitize_item_name(name: str) -> str:
     name = name.strip()
     if len(name) < 2 or len(name) > 120:
         raise ValueError("itemName length must be between 2 and 120 characters.")
-    if not _ALLOWED_PATTERN.match(name):
+    # only the stripped, length-checked name reaches the cache, so entries stay small
+    return _sanitize_cached(name)
+
+@lru_cache(maxsize=4096)
+def _sanitize_cached(name: str) -> str:
+    # invalid names raise and are not cached
+    # collapse excessive spaces, then validate in the same C-level set check
+    name = " ".join(name.split())
+    if not _ALLOWED_CHARS.issuperset(name):
         raise ValueError("itemName contains invalid characters.")
-    # collapse excessive spaces
-    name = re.sub(r"\s+", " ", name)
     return name
 
-def truncate_words(s: str, limit: int = 30) -> str:
-    words = s.strip().split()
+def truncate_words(s: str, limit: int = 30) -> Tuple[str, int]:
+    """Returns (text cut to at most `limit` words, its word count)."""
+    # maxsplit stops splitting after `limit` words; the tail stays one string
+    words = s.split(None, limit)
     if len(words) <= limit:
-        return s.strip()
-    return " ".join(words[:limit])
+        return s.strip(), len(words)
+    return " ".join(words[:limit]), limit
 
 # -------- Prompt engineering --------
 SYSTEM_PROMPT = (
@@ -66,43 +84,310 @@ _UPSELL_BY_KEYWORD = [
     (r"wrap|roll", "Masala Fries"),
 ]
 
-def _deterministic_choice(seq, seed):
-    rnd = random.Random(seed)
-    return rnd.choice(seq)
+def _compile_keyword_table(table):
+    """Compile a [(pattern, value), ...] table once, keeping its order. Patterns are lowercase."""
+    return [(re.compile(pat), value) for pat, value in table]
+
+def _match_keyword_table(table, text):
+    """Value of the first table entry that matches anywhere in text (list order wins)."""
+    # lowercasing once is much cheaper than re.I on every pattern
+    text = text.lower()
+    for regex, value in table:
+        if regex.search(text):
+            return value
+    return None
+
+_UPSELL_PATTERNS = _compile_keyword_table(_UPSELL_BY_KEYWORD)
 
-def mock_generate(item_name: str, model_hint: str) -> Tuple[str, str]:
-    """Generate description and upsell without calling an external LLM."""
-    seed = int(hashlib.sha256(item_name.lower().encode()).hexdigest(), 16)
-    adj1 = _deterministic_choice(_ADJECTIVES, seed)
-    adj2 = _deterministic_choice(_ADJECTIVES, seed >> 1)
+def mock_generate(item_name: str, model_hint: str) -> Tuple[str, str, int]:
+    """Generate (description, upsell, description word count) without calling an external LLM."""
+    # model_hint does not change the mock output, so cache on the name alone
+    return _mock_generate_cached(item_name)
+
+@lru_cache(maxsize=4096)
+def _mock_generate_cached(item_name: str) -> Tuple[str, str, int]:
+    # two independent 64-bit seeds straight from the digest; a modulo pick is all we need
+    digest = hashlib.sha256(item_name.lower().encode()).digest()
+    adj1 = _ADJECTIVES[int.from_bytes(digest[:8], "big") % len(_ADJECTIVES)]
+    adj2 = _ADJECTIVES[int.from_bytes(digest[8:16], "big") % len(_ADJECTIVES)]
     base = f"{item_name}: {adj1}, {adj2} and crafted to highlight balanced spices and textures. Served hot for maximum flavor."
-    description = truncate_words(base, 30)
+    description, word_count = truncate_words(base, 30)
 
-    upsell = "Iced Tea"
-    for pat, suggestion in _UPSELL_BY_KEYWORD:
-        if re.search(pat, item_name, flags=re.I):
-            upsell = suggestion
-            break
+    upsell = _match_keyword_table(_UPSELL_PATTERNS, item_name) or "Iced Tea"
     upsell_line = f"Pair it with a {upsell}!"
-    return description, upsell_line
+    return description, upsell_line, word_count
 
-# -------- Optional OpenAI call (HTTP) --------
-def call_openai(system_prompt: str, user_prompt: str, model_name: str) -> Tuple[str, str]:
+# -------- Shared HTTP session (aiohttp) --------
+_HTTP_TIMEOUT = aiohttp.ClientTimeout(total=20)
+
+class _LoopClients:
+    """Upstream clients bound to one event loop (aiohttp, redis and asyncio primitives all are)."""
+    __slots__ = ("session", "redis", "semaphores", "__weakref__")
+
+    def __init__(self):
+        self.session: aiohttp.ClientSession | None = None
+        self.redis: aioredis.Redis | None = None
+        self.semaphores: dict[str, asyncio.Semaphore] = {}
+
+# loop -> its clients; under uvicorn there is a single long-lived loop, under
+# runserver each request gets its own, which close_upstream_clients() releases
+_LOOP_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopClients]" = weakref.WeakKeyDictionary()
+
+def _loop_clients() -> _LoopClients:
+    loop = asyncio.get_running_loop()
+    clients = _LOOP_CLIENTS.get(loop)
+    if clients is None:
+        clients = _LOOP_CLIENTS[loop] = _LoopClients()
+    return clients
+
+def _get_session() -> aiohttp.ClientSession:
     """
-    Minimal HTTP call to OpenAI Chat Completions API.
-    If OPENAI_API_KEY is not set, raises RuntimeError.
+    Lazily create one ClientSession per event loop so all upstream calls share
+    a keep-alive connection pool.
+    """
+    clients = _loop_clients()
+    if clients.session is None or clients.session.closed:
+        clients.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, limit_per_host=64, ttl_dns_cache=300)
+        )
+    return clients.session
+
+async def close_upstream_clients() -> None:
+    """Close the HTTP session and Redis pool of the running loop, e.g. before a per-request loop ends."""
+    clients = _LOOP_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if clients is None:
+        return
+    if clients.session is not None:
+        await clients.session.close()
+    if clients.redis is not None:
+        await clients.redis.aclose()
+
+# -------- Per-upstream concurrency + QPS limits --------
+class AsyncTokenBucket:
+    """
+    Leaky-bucket QPS limiter for one upstream (same refill math as the per-IP limiter).
+    It also honours the upstream's own limits: a 429 Retry-After or an exhausted
+    x-ratelimit-remaining-* header pauses every caller until the reset.
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY not set; using mock mode instead.")
 
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-    body = {
-        "model": model_name,  # e.g., "gpt-3.5-turbo" or "gpt-4o-mini"
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            wait = self.paused_until - now
+            if wait <= 0:
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        # capped: no caller waits past its own deadline anyway, and a huge header value
+        # must not stall the upstream for everyone
+        seconds = min(seconds, _REQUEST_DEADLINE)
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers) -> None:
+        for kind in ("requests", "tokens"):
+            if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+                reset = _parse_reset(headers.get(f"x-ratelimit-reset-{kind}", ""))
+                if reset:
+                    self.pause(reset)
+
+_RESET_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_RESET_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def _parse_reset(value: str) -> float:
+    """Seconds from an OpenAI reset header such as '20ms', '1s' or '6m0s'."""
+    return sum(float(n) * _RESET_UNITS[unit] for n, unit in _RESET_PART.findall(value))
+
+def _parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+# upstream -> (max requests in flight, requests per second)
+_UPSTREAM_LIMITS = {
+    "openai": (64, 10.0),
+    "deepseek": (64, 10.0),
+    "serpapi": (16, 5.0),
+}
+_BUCKETS_BY_UPSTREAM = {
+    name: AsyncTokenBucket(rate=qps, capacity=qps) for name, (_, qps) in _UPSTREAM_LIMITS.items()
+}
+def _upstream_semaphore(upstream: str) -> asyncio.Semaphore:
+    semaphores = _loop_clients().semaphores
+    sem = semaphores.get(upstream)
+    if sem is None:
+        sem = semaphores[upstream] = asyncio.Semaphore(_UPSTREAM_LIMITS[upstream][0])
+    return sem
+
+# Retry transient upstream failures like urllib3's Retry(total=3, backoff_factor=0.3):
+# only idempotent methods by default, since a 5xx or dropped connection after a POST
+# was sent may still have run (and billed) it
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_REJECTED_STATUSES = frozenset({429})  # the upstream refused without running the request
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+_MAX_RETRIES = 3
+_BACKOFF_FACTOR = 0.3
+_REQUEST_DEADLINE = 30.0  # seconds for one _request, across all attempts and waits
+
+def _remaining(deadline: float) -> float:
+    return max(0.0, deadline - time.monotonic())
+
+@asynccontextmanager
+async def _request(upstream: str, method: str, url: str, data=None, retry_statuses=None, **kwargs):
+    """
+    Open a request to `upstream` (a key of _UPSTREAM_LIMITS) on the shared session and
+    yield the successful response. Calls are capped by the upstream's semaphore and QPS bucket.
+    Idempotent methods retry 429/5xx responses and dropped connections with exponential
+    backoff, or exactly Retry-After when a 429 sends one. Other methods are sent once
+    unless the caller opts in with `retry_statuses` (status codes only, never dropped
+    connections). Any other error status raises aiohttp.ClientResponseError. `data` may be
+    a zero-arg callable for single-use bodies (e.g. aiohttp.FormData) rebuilt per attempt.
+    """
+    idempotent = method.upper() in _IDEMPOTENT_METHODS
+    if retry_statuses is None:
+        retry_statuses = _RETRY_STATUSES if idempotent else frozenset()
+    max_retries = _MAX_RETRIES if idempotent or retry_statuses else 0
+
+    session = _get_session()
+    bucket = _BUCKETS_BY_UPSTREAM[upstream]
+    deadline = time.monotonic() + _REQUEST_DEADLINE
+    yielded = False
+    for attempt in range(max_retries + 1):
+        last_try = attempt == max_retries
+        delay = _BACKOFF_FACTOR * (2 ** attempt)
+        try:
+            async with _upstream_semaphore(upstream):
+                # waiting out a pause past our deadline raises TimeoutError (the view falls back)
+                await asyncio.wait_for(bucket.acquire(), _remaining(deadline))
+                timeout = aiohttp.ClientTimeout(total=min(_HTTP_TIMEOUT.total, _remaining(deadline)))
+                body = data() if callable(data) else data
+                async with session.request(method, url, data=body, timeout=timeout, **kwargs) as resp:
+                    bucket.update_from_headers(resp.headers)
+                    if resp.status == 429:
+                        retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+                        if retry_after is not None:
+                            delay = retry_after
+                            bucket.pause(delay)
+                    out_of_time = time.monotonic() + delay >= deadline
+                    if last_try or out_of_time or resp.status not in retry_statuses:
+                        resp.raise_for_status()
+                        yielded = True
+                        yield resp
+                        return
+        except aiohttp.ClientConnectionError:
+            # errors while the caller reads the body are theirs; only retry before yielding
+            if last_try or yielded or not idempotent or time.monotonic() + delay >= deadline:
+                raise
+        await asyncio.sleep(delay)
+
+async def _fetch(upstream: str, method: str, url: str, **kwargs) -> bytes:
+    """Send a request via _request and return the raw response body."""
+    async with _request(upstream, method, url, **kwargs) as resp:
+        return await resp.read()
+
+async def _fetch_json(upstream: str, method: str, url: str, **kwargs):
+    """Like _fetch, but returns the orjson-decoded body."""
+    return orjson.loads(await _fetch(upstream, method, url, **kwargs))
+
+# -------- Optional shared Redis (rate limit + upstream cache) --------
+REDIS_URL = os.getenv("REDIS_URL")
+
+def _get_redis() -> aioredis.Redis:
+    clients = _loop_clients()
+    if clients.redis is None:
+        clients.redis = aioredis.from_url(REDIS_URL, socket_connect_timeout=0.5, socket_timeout=0.5)
+    return clients.redis
+
+# After a Redis failure skip it for a while instead of paying the connect timeout on every call.
+_REDIS_RETRY_AFTER = 30.0
+_redis_down_until = 0.0
+
+def _redis_available() -> bool:
+    return bool(REDIS_URL) and time.monotonic() >= _redis_down_until
+
+def _mark_redis_down() -> None:
+    global _redis_down_until
+    _redis_down_until = time.monotonic() + _REDIS_RETRY_AFTER
+
+# -------- Upstream response cache (TTL) --------
+UPSTREAM_CACHE_TTL = 3600
+
+_UPSTREAM_CACHE = TTLCache(maxsize=10_000, ttl=UPSTREAM_CACHE_TTL)
+_UPSTREAM_CACHE_LOCK = threading.Lock()
+
+def _redis_cache_key(key: tuple) -> str:
+    return "llm:v2:" + hashlib.sha256(orjson.dumps(key)).hexdigest()
+
+async def _cache_get(key: tuple):
+    """Cached upstream result for key from the local TTLCache, then Redis; None on miss."""
+    with _UPSTREAM_CACHE_LOCK:
+        result = _UPSTREAM_CACHE.get(key)
+    if result is not None or not _redis_available():
+        return result
+    try:
+        raw = await _get_redis().get(_redis_cache_key(key))
+    except (aioredis.RedisError, OSError):
+        _mark_redis_down()
+        return None
+    if raw is None:
+        return None
+    try:
+        cached = orjson.loads(raw)
+    except ValueError:
+        return None
+    result = tuple(cached) if isinstance(cached, list) else cached
+    with _UPSTREAM_CACHE_LOCK:
+        _UPSTREAM_CACHE[key] = result
+    return result
+
+async def _cache_set(key: tuple, result) -> None:
+    with _UPSTREAM_CACHE_LOCK:
+        _UPSTREAM_CACHE[key] = result
+    if _redis_available():
+        try:
+            await _get_redis().set(_redis_cache_key(key), orjson.dumps(result), ex=UPSTREAM_CACHE_TTL)
+        except (aioredis.RedisError, OSError):
+            _mark_redis_down()
+
+def ttl_cached(fn):
+    """
+    Cache an async upstream call per (function, args) for UPSTREAM_CACHE_TTL seconds.
+    Checks the in-process TTLCache first, then Redis (if REDIS_URL is set) so
+    workers share results. Exceptions are not cached.
+    """
+    @wraps(fn)
+    async def wrapper(*args):
+        key = (fn.__name__, *args)
+        result = await _cache_get(key)
+        if result is None:
+            result = await fn(*args)
+            await _cache_set(key, result)
+        return result
+    return wrapper
+
+# -------- Chat completion request/response shape (OpenAI-compatible) --------
+def _chat_body(system_prompt: str, user_prompt: str, model_name: str) -> dict:
+    return {
+        "model": model_name,
         "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
@@ -110,50 +395,256 @@ def call_openai(system_prompt: str, user_prompt: str, model_name: str) -> Tuple[
         "temperature": 0.7,
         "max_tokens": 120,
     }
-    resp = requests.post(url, headers=headers, data=json.dumps(body), timeout=20)
-    resp.raise_for_status()
-    data = resp.json()
-    content = data["choices"][0]["message"]["content"]
 
+def _parse_llm_content(content: str) -> Tuple[str, str, int]:
     # The model is instructed to output JSON with keys description, upsell.
     try:
-        parsed = json.loads(content)
-        description = truncate_words(str(parsed.get("description", "")).strip(), 30)
+        parsed = orjson.loads(content)
+        description, word_count = truncate_words(str(parsed.get("description", "")), 30)
         upsell = str(parsed.get("upsell", "")).strip()
         if not upsell.lower().startswith("pair it with"):
             upsell = f"Pair it with {upsell}."
-        return description, upsell
+        return description, upsell, word_count
     except Exception:
         # If the LLM didn't return JSON, fall back to mock-style extraction
         # Simple heuristic: first line desc, second line upsell
         lines = [ln.strip() for ln in content.splitlines() if ln.strip()]
-        description = truncate_words(lines[0], 30) if lines else "Tasty and satisfying."
+        description, word_count = truncate_words(lines[0] if lines else "Tasty and satisfying.", 30)
         upsell = lines[1] if len(lines) > 1 else "Pair it with a refreshing beverage!"
-        return description, upsell
+        return description, upsell, word_count
 
-# -------- Tiny rate limiter (per-IP leaky bucket) --------
-WINDOW_SEC = 15 * 60
-MAX_REQUESTS = 60  # e.g., 60 requests per 15 minutes
+def _sse_delta(raw_line: bytes) -> str | None:
+    """
+    Content delta carried by one SSE line of a streamed chat completion, if any.
+    Raises RuntimeError on an in-stream error event.
+    """
+    line = raw_line.strip()
+    if not line.startswith(b"data:"):
+        return None
+    payload = line[5:].strip()
+    if payload == b"[DONE]":
+        return None
+    event = orjson.loads(payload)
+    if event.get("error"):
+        raise RuntimeError(f"Upstream stream error: {event['error']}")
+    choices = event.get("choices") or []
+    return (choices[0].get("delta") or {}).get("content") if choices else None
+
+async def _stream_chat_content(upstream: str, url: str, headers: dict, body: dict) -> str:
+    """
+    POST a streaming (SSE) chat completion and return the message content.
+    Returns as soon as the accumulated content parses as a complete JSON object; otherwise
+    reads to the end. Raises RuntimeError if the stream carried no content, so an empty
+    answer is never cached.
+    """
+    parts = []
+    request = _request(
+        upstream, "POST", url, headers=headers, data=orjson.dumps({**body, "stream": True}),
+        retry_statuses=_REJECTED_STATUSES,  # a 429 was not run or billed, so it is safe to resend
+    )
+    async with request as resp:
+        async for raw_line in resp.content:
+            delta = _sse_delta(raw_line)
+            if not delta:
+                continue
+            parts.append(delta)
+            if "}" in delta:
+                content = "".join(parts)
+                try:
+                    orjson.loads(content)
+                except orjson.JSONDecodeError:
+                    continue
+                # leaving with the tail unread closes this connection instead of pooling it;
+                # worth it to answer without waiting for the last tokens
+                return content
+    if not parts:
+        raise RuntimeError("Upstream stream carried no content.")
+    return "".join(parts)
 
-_BUCKETS = defaultdict(deque)  # ip -> deque[timestamps]
+# -------- Optional OpenAI call (HTTP) --------
+OPENAI_API_BASE = "https://api.openai.com/v1"
 
-def check_rate_limit(ip: str) -> bool:
-    now = time.time()
-    dq = _BUCKETS[ip]
-    # drop old timestamps
-    while dq and now - dq[0] > WINDOW_SEC:
-        dq.popleft()
-    if len(dq) >= MAX_REQUESTS:
-        return False
-    dq.append(now)
-    return True
+def _openai_api_key() -> str:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY not set; using mock mode instead.")
+    return api_key
 
+@ttl_cached
+async def call_openai(system_prompt: str, user_prompt: str, model_name: str) -> Tuple[str, str, int]:
+    """
+    Minimal HTTP call to OpenAI Chat Completions API.
+    If OPENAI_API_KEY is not set, raises RuntimeError.
+    """
+    api_key = _openai_api_key()
 
-def call_deepseek(system_prompt: str, user_prompt: str, model_name: str) -> Tuple[str, str]:
+    url = f"{OPENAI_API_BASE}/chat/completions"
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    body = _chat_body(system_prompt, user_prompt, model_name)  # e.g., "gpt-3.5-turbo" or "gpt-4o-mini"
+    content = await _stream_chat_content("openai", url, headers, body)
+    return _parse_llm_content(content)
+
+# -------- OpenAI Batch API (bulk menu generation) --------
+def build_batch_jsonl(item_names: list[str], model_name: str) -> bytes:
+    """Batch input file: one chat completion request per item, keyed by item name as custom_id."""
+    lines = [
+        orjson.dumps({
+            "custom_id": name,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": _chat_body(*build_prompt(name), model_name),
+        })
+        for name in item_names
+    ]
+    return b"\n".join(lines) + b"\n"
+
+def parse_batch_output(raw: bytes) -> dict:
+    """Batch output file -> {custom_id: (description, upsell, word_count)}, skipping failed rows."""
+    results = {}
+    for line in raw.splitlines():
+        if not line.strip():
+            continue
+        try:
+            row = orjson.loads(line)
+            response = row.get("response") or {}
+            if response.get("status_code") != 200:
+                continue  # failed items are left out; the client can retry them individually
+            content = response["body"]["choices"][0]["message"]["content"]
+            if not isinstance(content, str):
+                continue  # refusal / tool call: no text to parse
+            results[row["custom_id"]] = _parse_llm_content(content)
+        except (orjson.JSONDecodeError, AttributeError, KeyError, IndexError, TypeError):
+            continue  # one malformed row must not fail the whole batch on every poll
+    return results
+
+async def submit_openai_batch(item_names: list[str], model_name: str) -> Tuple[dict, str | None]:
+    """
+    Queue chat completions for many items on the OpenAI Batch API (24h window, ~50% cheaper).
+    Items already in the upstream cache are returned right away and not resubmitted.
+    Returns ({item_name: (description, upsell, word_count)} for cached items, batch id or None).
+    """
+    auth = {"Authorization": f"Bearer {_openai_api_key()}"}
+
+    hits = await asyncio.gather(
+        *(_cache_get(("call_openai", *build_prompt(name), model_name)) for name in item_names)
+    )
+    cached = {name: hit for name, hit in zip(item_names, hits) if hit is not None}
+    missing = [name for name in item_names if name not in cached]
+    if not missing:
+        return cached, None
+    jsonl = build_batch_jsonl(missing, model_name)
+
+    def upload_form():
+        form = aiohttp.FormData()
+        form.add_field("purpose", "batch")
+        form.add_field("file", jsonl, filename="menu-items.jsonl", content_type="application/jsonl")
+        return form
+
+    uploaded = await _fetch_json("openai", "POST", f"{OPENAI_API_BASE}/files", headers=auth, data=upload_form)
+    batch = await _fetch_json(
+        "openai",
+        "POST",
+        f"{OPENAI_API_BASE}/batches",
+        headers={**auth, "Content-Type": "application/json"},
+        data=orjson.dumps({
+            "input_file_id": uploaded["id"],
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h",
+            "metadata": {"model": model_name},  # needed to rebuild cache keys on retrieval
+        }),
+    )
+    return cached, batch["id"]
+
+async def fetch_openai_batch(batch_id: str) -> Tuple[str, str, dict]:
+    """
+    Look up a batch from submit_openai_batch.
+    Returns (status, model_name, {item_name: (description, upsell, word_count)}); results are empty
+    until status is "completed", and are then written to the upstream cache too.
+    """
+    auth = {"Authorization": f"Bearer {_openai_api_key()}"}
+    batch = await _fetch_json("openai", "GET", f"{OPENAI_API_BASE}/batches/{batch_id}", headers=auth)
+    status = batch.get("status", "unknown")
+    model_name = (batch.get("metadata") or {}).get("model", "")
+    if status != "completed" or not batch.get("output_file_id"):
+        return status, model_name, {}
+
+    raw = await _fetch("openai", "GET", f"{OPENAI_API_BASE}/files/{batch['output_file_id']}/content", headers=auth)
+    results = parse_batch_output(raw)
+    await asyncio.gather(
+        *(
+            _cache_set(("call_openai", *build_prompt(name), model_name), result)
+            for name, result in results.items()
+        )
+    )
+    return status, model_name, results
+
+# -------- Tiny rate limiter (per-IP token bucket) --------
+WINDOW_SEC = 15 * 60
+MAX_REQUESTS = 60  # e.g., 60 requests per 15 minutes
+_REFILL_PER_SEC = MAX_REQUESTS / WINDOW_SEC
+_SWEEP_EVERY = 10_000  # calls between evictions of idle IPs (across all shards)
+_SHARD_COUNT = 16  # power of two so the shard index is a mask
+
+class _BucketShard:
+    """One slice of the per-IP buckets with its own lock, so IPs on different shards never contend."""
+    __slots__ = ("buckets", "lock", "calls_since_sweep")
+
+    def __init__(self):
+        # ip -> array("d", [tokens, last_refill]); two unboxed doubles instead of a list of float objects
+        self.buckets: dict[str, array] = {}
+        self.lock = threading.Lock()
+        self.calls_since_sweep = 0
+
+    def sweep(self, now: float) -> None:
+        # an IP idle for a full window has a full bucket again, same as a new IP
+        for ip in [ip for ip, b in self.buckets.items() if now - b[1] >= WINDOW_SEC]:
+            del self.buckets[ip]
+
+_SHARDS = [_BucketShard() for _ in range(_SHARD_COUNT)]
+
+def _check_rate_limit_local(ip: str) -> bool:
+    shard = _SHARDS[hash(ip) & (_SHARD_COUNT - 1)]
+    with shard.lock:
+        now = time.monotonic()  # immune to wall-clock jumps
+        shard.calls_since_sweep += 1
+        if shard.calls_since_sweep >= _SWEEP_EVERY // _SHARD_COUNT:
+            shard.calls_since_sweep = 0
+            shard.sweep(now)
+
+        b = shard.buckets.get(ip)
+        if b is None:
+            shard.buckets[ip] = array("d", (MAX_REQUESTS - 1, now))
+            return True
+        b[0] = min(MAX_REQUESTS, b[0] + (now - b[1]) * _REFILL_PER_SEC)
+        b[1] = now
+        if b[0] < 1:
+            return False
+        b[0] -= 1
+        return True
+
+# Shared fixed-window counter in Redis so the limit holds across all workers.
+# Without REDIS_URL (local dev) or when Redis is down we use the per-process bucket.
+
+async def check_rate_limit(ip: str) -> bool:
+    if not _redis_available():
+        return _check_rate_limit_local(ip)
+    key = f"rl:{ip}:{int(time.time() // WINDOW_SEC)}"
+    try:
+        async with _get_redis().pipeline(transaction=True) as pipe:
+            count, _ = await pipe.incr(key).expire(key, WINDOW_SEC).execute()
+    except (aioredis.RedisError, OSError):
+        _mark_redis_down()
+        return _check_rate_limit_local(ip)
+    return count <= MAX_REQUESTS
+
+@ttl_cached
+async def call_deepseek(system_prompt: str, user_prompt: str, model_name: str) -> Tuple[str, str, int]:
     """
     Call DeepSeek API (OpenAI-compatible) to generate description + upsell.
     """
-    import os, json, requests
     api_key = os.getenv("DEEPSEEK_API_KEY")
     api_base = os.getenv("DEEPSEEK_API_BASE", "https://api.deepseek.com/v1")
     if not api_key:
@@ -164,40 +655,13 @@ def call_deepseek(system_prompt: str, user_prompt: str, model_name: str) -> Tupl
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
-    body = {
-        "model": model_name,  # e.g. "deepseek-chat" or "deepseek-coder"
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        "temperature": 0.7,
-        "max_tokens": 120,
-    }
-
-    resp = requests.post(url, headers=headers, data=json.dumps(body), timeout=20)
-    resp.raise_for_status()
-    data = resp.json()
-    content = data["choices"][0]["message"]["content"]
-
+    body = _chat_body(system_prompt, user_prompt, model_name)  # e.g. "deepseek-chat" or "deepseek-coder"
+    content = await _stream_chat_content("deepseek", url, headers, body)
     # Expect JSON output (same as OpenAI path)
-    try:
-        parsed = json.loads(content)
-        description = truncate_words(str(parsed.get("description", "")), 30)
-        upsell = str(parsed.get("upsell", "")).strip()
-        if not upsell.lower().startswith("pair it with"):
-            upsell = f"Pair it with {upsell}."
-        return description, upsell
-    except Exception:
-        lines = [ln.strip() for ln in content.splitlines() if ln.strip()]
-        description = truncate_words(lines[0], 30) if lines else "Tasty and satisfying."
-        upsell = lines[1] if len(lines) > 1 else "Pair it with a refreshing beverage!"
-        return description, upsell
-
-
-import os, re, json, requests
-from typing import Tuple
+    return _parse_llm_content(content)
 
-# ... keep existing imports and helpers (sanitize_item_name, truncate_words, etc.)
+# -------- SerpAPI upsell lookup --------
+SERPAPI_URL = "https://serpapi.com/search.json"
 
 _SERP_UPSELL_CANDIDATES = [
     # pattern, normalized upsell text (without "Pair it with")
@@ -214,21 +678,49 @@ _SERP_UPSELL_CANDIDATES = [
     (r"gulab jamun", "Gulab Jamun"),
 ]
 
+# simple cuisine-specific fallbacks when no search result names a pairing
+_SERP_FALLBACK_BY_KEYWORD = [
+    (r"paneer|tikka|tandoori|kebab|biryani|naan", "a Mango Lassi"),
+    (r"pizza|pasta", "Garlic Bread"),
+    (r"burger", "Crispy Fries"),
+]
+
+_SERP_UPSELL_PATTERNS = _compile_keyword_table(_SERP_UPSELL_CANDIDATES)
+_SERP_FALLBACK_PATTERNS = _compile_keyword_table(_SERP_FALLBACK_BY_KEYWORD)
+
 def serp_pick_upsell_from_text(text: str) -> str | None:
-    text_low = text.lower()
-    for pat, upsell in _SERP_UPSELL_CANDIDATES:
-        if re.search(pat, text_low):
-            return upsell
-    return None
+    return _match_keyword_table(_SERP_UPSELL_PATTERNS, text)
 
-def call_serpapi_for_upsell(item_name: str) -> str:
+async def _serp_query_upsell(q: str, api_key: str) -> str | None:
+    """
+    Run one SerpAPI search. Returns the first known pairing in its results, "" when the
+    search worked but named none, or None when the search itself failed.
+    """
+    params = {"engine": "google", "q": q, "api_key": api_key, "hl": "en"}
+    try:
+        data = await _fetch_json("serpapi", "GET", SERPAPI_URL, params=params)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        return None
+
+    # scan organic results + snippets
+    organic = data.get("organic_results", []) or []
+    all_text = " ".join(
+        filter(None, [*(res.get("title") for res in organic), *(res.get("snippet") for res in organic)])
+    )
+    # try known pairings
+    return serp_pick_upsell_from_text(all_text) or ""
+
+@ttl_cached
+async def call_serpapi_for_upsell(item_name: str) -> str:
     """
     Use SerpAPI (Google results) to infer a good upsell pairing for the dish.
-    Returns a string like 'Pair it with Garlic Bread!' or a generic beverage if nothing matched.
+    Returns a string like 'Pair it with Garlic Bread!'.
+    Raises RuntimeError when the key is missing or every query failed, so the caller
+    can fall back (and the failure is never cached).
     """
     api_key = os.getenv("SERPAPI_KEY")
     if not api_key:
-        return "Pair it with a refreshing beverage!"
+        raise RuntimeError("SERPAPI_KEY not set.")
 
     # A few phrasing variants to increase chance of good snippets
     queries = [
@@ -237,37 +729,21 @@ def call_serpapi_for_upsell(item_name: str) -> str:
         f"{item_name} accompaniment popular",
     ]
 
+    tasks = [asyncio.create_task(_serp_query_upsell(q, api_key)) for q in queries]
     try:
-        found = None
-        for q in queries:
-            url = "https://serpapi.com/search.json"
-            params = {"engine": "google", "q": q, "api_key": api_key, "hl": "en"}
-            r = requests.get(url, params=params, timeout=20)
-            if not r.ok:
-                continue
-            data = r.json()
-
-            # scan organic results + snippets
-            organic = data.get("organic_results", []) or []
-            all_text = " ".join(
-                filter(None, [*(res.get("title") for res in organic), *(res.get("snippet") for res in organic)])
-            )
-            # try known pairings
-            found = serp_pick_upsell_from_text(all_text)
+        # queries are independent: take whichever answers first with a known pairing
+        found, answered = None, False
+        for next_done in asyncio.as_completed(tasks):
+            found = await next_done
+            answered = answered or found is not None
             if found:
                 break
-
-        if not found:
-            # simple cuisine-specific fallbacks
-            if re.search(r"paneer|tikka|tandoori|kebab|biryani|naan", item_name, flags=re.I):
-                found = "a Mango Lassi"
-            elif re.search(r"pizza|pasta", item_name, flags=re.I):
-                found = "Garlic Bread"
-            elif re.search(r"burger", item_name, flags=re.I):
-                found = "Crispy Fries"
-            else:
-                found = "Iced Tea"
-
-        return f"Pair it with {found}!"
-    except Exception:
-        return "Pair it with Iced Tea!"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if not found:
+        if not answered:
+            raise RuntimeError("All SerpAPI queries failed.")
+        found = _match_keyword_table(_SERP_FALLBACK_PATTERNS, item_name) or "Iced Tea"
+    return f"Pair it with {found}!"
@@ -1,5 +1,12 @@
-import json
-from django.http import JsonResponse
+import re
+import hashlib
+from functools import wraps
+
+import aiohttp
+import orjson
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse
+from django.utils.http import parse_etags, quote_etag
 from django.views.decorators.csrf import csrf_exempt
 
 from .utils import (
@@ -10,29 +17,96 @@ from .utils import (
     check_rate_limit,
     call_deepseek,
     call_serpapi_for_upsell,
+    submit_openai_batch,
+    fetch_openai_batch,
+    UPSTREAM_CACHE_TTL,
+    close_upstream_clients,
 )
 
+MAX_BATCH_ITEMS = 200
+_BATCH_ID_PATTERN = re.compile(r"^batch_[A-Za-z0-9]+$")
+
+
+class ORJSONResponse(HttpResponse):
+    """JsonResponse equivalent that serializes with orjson."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=orjson.dumps(data), **kwargs)
+
 
 def _client_ip(request):
-    xff = request.META.get("HTTP_X_FORWARDED_FOR")
+    meta = request.META
+    xff = meta.get("HTTP_X_FORWARDED_FOR")
     if xff:
-        return xff.split(",")[0].strip()
-    return request.META.get("REMOTE_ADDR", "unknown")
+        # only the first hop matters; partition avoids splitting long proxy chains
+        return xff.partition(",")[0].strip()
+    return meta.get("REMOTE_ADDR", "unknown")
+
+
+def _release_clients_unless_asgi(view):
+    """
+    Under WSGI (runserver) every async view runs on its own short-lived event loop, so
+    close that loop's upstream clients before it goes away. Under ASGI they are reused.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        finally:
+            if not isinstance(request, ASGIRequest):
+                await close_upstream_clients()
+    return wrapper
+
+
+def _openai_model(model_choice):
+    return "gpt-3.5-turbo" if "3.5" in model_choice else "gpt-4o-mini"
+
+
+def _response_etag(content):
+    # hash the body itself: sampled LLM replies can differ per worker or after the cache TTL
+    return quote_etag(hashlib.sha1(content).hexdigest())
+
+
+def _set_cache_headers(response, etag):
+    response["ETag"] = etag
+    response["Cache-Control"] = f"public, max-age={UPSTREAM_CACHE_TTL}"
+    return response
+
+
+def _item_result(item_name, model_used, description, upsell, word_count):
+    return {
+        "itemName": item_name,
+        "model": model_used,
+        "description": description,
+        "upsell": upsell,
+        "meta": {"wordCount": word_count},
+    }
 
 
 @csrf_exempt  # simplified for take-home; in prod use proper auth/CSRF
-def generate_item_details(request):
-    if request.method != "POST":
-        return JsonResponse({"detail": "Method not allowed"}, status=405)
+@_release_clients_unless_asgi
+async def generate_item_details(request):
+    """
+    POST a JSON body, or GET with the same fields as query params. GET responses carry an
+    ETag and Cache-Control so browsers/CDNs can reuse them and revalidate with a 304.
+    """
+    if request.method not in ("GET", "POST"):
+        return ORJSONResponse({"detail": "Method not allowed"}, status=405)
 
     ip = _client_ip(request)
-    if not check_rate_limit(ip):
-        return JsonResponse({"detail": "Rate limit exceeded. Try later."}, status=429)
+    if not await check_rate_limit(ip):
+        return ORJSONResponse({"detail": "Rate limit exceeded. Try later."}, status=429)
 
-    try:
-        payload = json.loads(request.body.decode("utf-8"))
-    except Exception:
-        return JsonResponse({"detail": "Invalid JSON body"}, status=400)
+    if request.method == "GET":
+        payload = request.GET
+    else:
+        try:
+            payload = orjson.loads(request.body)
+        except Exception:
+            return ORJSONResponse({"detail": "Invalid JSON body"}, status=400)
+        if not isinstance(payload, dict):
+            return ORJSONResponse({"detail": "JSON body must be an object"}, status=400)
 
     item_name = payload.get("itemName", "")
     mode = (payload.get("mode") or "mock").lower()        # "mock", "openai", "deepseek"
@@ -41,44 +115,146 @@ def generate_item_details(request):
     try:
         item_name = sanitize_item_name(item_name)
     except ValueError as e:
-        return JsonResponse({"detail": str(e)}, status=400)
+        return ORJSONResponse({"detail": str(e)}, status=400)
 
+    cacheable = request.method == "GET"
     sys_prompt, user_prompt = build_prompt(item_name)
 
     try:
         if mode == "openai":
-            model_name = "gpt-3.5-turbo" if "3.5" in model_choice else "gpt-4o-mini"
-            description, upsell = call_openai(sys_prompt, user_prompt, model_name)
+            model_name = _openai_model(model_choice)
+            description, upsell, word_count = await call_openai(sys_prompt, user_prompt, model_name)
             model_used = f"openai-{model_name}"
 
         # elif mode == "deepseek":
         #     # common DeepSeek chat models: "deepseek-chat" (general), "deepseek-coder" (coding)
         #     model_name = "deepseek-chat"
-        #     description, upsell = call_deepseek(sys_prompt, user_prompt, model_name)
+        #     description, upsell, word_count = await call_deepseek(sys_prompt, user_prompt, model_name)
         #     model_used = f"deepseek-{model_name}"
 
         elif mode == "serpapi":
         # Generate desc via mock (≤30 words), but compute upsell via SerpAPI
-            description, _ = mock_generate(item_name, model_choice)
-            upsell = call_serpapi_for_upsell(item_name)
+            description, _, word_count = mock_generate(item_name, model_choice)
+            upsell = await call_serpapi_for_upsell(item_name)
             model_used = "serpapi+mock-desc"
 
         else:
-            description, upsell = mock_generate(item_name, model_choice)
+            description, upsell, word_count = mock_generate(item_name, model_choice)
             model_used = f"mock-{model_choice}"
 
     except Exception:
         # any failure falls back to mock so the UI still works
-        description, upsell = mock_generate(item_name, model_choice)
+        description, upsell, word_count = mock_generate(item_name, model_choice)
         model_used = f"mock-{model_choice}"
+        cacheable = False  # don't let caches pin a fallback answer
+
+    response = ORJSONResponse(_item_result(item_name, model_used, description, upsell, word_count), status=200)
+    if cacheable:
+        etag = _response_etag(response.content)
+        if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            return _set_cache_headers(HttpResponse(status=304), etag)
+        _set_cache_headers(response, etag)
+    return response
+
+
+@csrf_exempt
+@_release_clients_unless_asgi
+async def generate_item_details_batch(request):
+    """
+    Bulk variant for whole menus: {"items": [...], "mode": "mock" | "openai", "model": ...}.
+    In openai mode uncached items go to the OpenAI Batch API and the response is 202 with a
+    batchId to poll; other modes (or a missing API key) are answered from the mock right away.
+    """
+    if request.method != "POST":
+        return ORJSONResponse({"detail": "Method not allowed"}, status=405)
+
+    ip = _client_ip(request)
+    if not await check_rate_limit(ip):
+        return ORJSONResponse({"detail": "Rate limit exceeded. Try later."}, status=429)
+
+    try:
+        payload = orjson.loads(request.body)
+    except Exception:
+        return ORJSONResponse({"detail": "Invalid JSON body"}, status=400)
+    if not isinstance(payload, dict):
+        return ORJSONResponse({"detail": "JSON body must be an object"}, status=400)
+
+    items = payload.get("items")
+    mode = (payload.get("mode") or "mock").lower()
+    model_choice = (payload.get("model") or "gpt-4").lower()
+
+    if not isinstance(items, list) or not items:
+        return ORJSONResponse({"detail": "items must be a non-empty list."}, status=400)
+    if len(items) > MAX_BATCH_ITEMS:
+        return ORJSONResponse({"detail": f"At most {MAX_BATCH_ITEMS} items per batch."}, status=400)
+    try:
+        # dedupe so each dish is generated (and billed) once
+        item_names = list(dict.fromkeys(sanitize_item_name(name) for name in items))
+    except ValueError as e:
+        return ORJSONResponse({"detail": str(e)}, status=400)
+
+    if mode == "openai":
+        model_name = _openai_model(model_choice)
+        try:
+            cached, batch_id = await submit_openai_batch(item_names, model_name)
+        except Exception:
+            pass  # fall back to mock so the UI still works
+        else:
+            return ORJSONResponse(
+                {
+                    "batchId": batch_id,
+                    "status": "submitted" if batch_id else "completed",
+                    "results": [
+                        _item_result(name, f"openai-{model_name}", *cached[name]) for name in cached
+                    ],
+                    "pending": [name for name in item_names if name not in cached],
+                },
+                status=202 if batch_id else 200,
+            )
+
+    return ORJSONResponse(
+        {
+            "batchId": None,
+            "status": "completed",
+            "results": [
+                _item_result(name, f"mock-{model_choice}", *mock_generate(name, model_choice))
+                for name in item_names
+            ],
+            "pending": [],
+        },
+        status=200,
+    )
+
+
+@_release_clients_unless_asgi
+async def generate_item_details_batch_status(request, batch_id):
+    """Poll a batch from generate_item_details_batch; results are filled in once completed."""
+    if request.method != "GET":
+        return ORJSONResponse({"detail": "Method not allowed"}, status=405)
+
+    ip = _client_ip(request)
+    if not await check_rate_limit(ip):
+        return ORJSONResponse({"detail": "Rate limit exceeded. Try later."}, status=429)
+
+    if not _BATCH_ID_PATTERN.match(batch_id):
+        return ORJSONResponse({"detail": "Invalid batch id"}, status=400)
+
+    try:
+        status, model_name, results = await fetch_openai_batch(batch_id)
+    except aiohttp.ClientResponseError as e:
+        if e.status == 404:
+            return ORJSONResponse({"detail": "Batch not found"}, status=404)
+        return ORJSONResponse({"detail": "Could not fetch batch status"}, status=502)
+    except Exception:
+        return ORJSONResponse({"detail": "Could not fetch batch status"}, status=502)
 
-    return JsonResponse(
+    return ORJSONResponse(
         {
-            "itemName": item_name,
-            "model": model_used,
-            "description": description,
-            "upsell": upsell,
-            "meta": {"wordCount": len(description.split())},
+            "batchId": batch_id,
+            "status": status,
+            "results": [
+                _item_result(name, f"openai-{model_name}", *result) for name, result in results.items()
+            ],
         },
         status=200,
     )
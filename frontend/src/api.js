@@ -13,9 +13,8 @@ async function http(url, options = {}) {
   return res.json();
 }
 
+// GET so the browser can reuse the response (Cache-Control/ETag) for repeat items
 export function generateDetails(itemName, model = "gpt-4", mode = "mock") {
-  return http(`${API_BASE}/generate-item-details/`, {
-    method: "POST",
-    body: JSON.stringify({ itemName, model, mode })
-  });
+  const params = new URLSearchParams({ itemName, model, mode });
+  return http(`${API_BASE}/generate-item-details/?${params}`);
 }